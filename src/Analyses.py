@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Vectorised analyses of experiment outputs.
+
+Data sets are handled as dictionaries of equal-length numpy arrays (one
+array per column), with factors coded as integer indices into the level
+tuples below. Each data set can be read from the csv files written by
+Experiment.output_fam_data and Experiment.output_contrast_data, or from a
+binary .npz copy of each csv file. Binary copies are written next to
+the csv files by convert_results, typically once after a run, and are
+then read instead of csv files that are not newer than them.
+When reading several files at once (one per salience ratio), subject
+numbers are offset so that they are unique across files, and a
+salience_ratio column is added, as done in stats/Routines.R.
+
+Reading functions:
+	read_fam_errors -- read familiarisation errors
+	read_fam_hidden_reps -- read familiarisation hidden representations
+	read_contrast_trials -- read contrast test trial looking times
+	convert_results -- write a binary .npz copy of each csv file
+
+Analysis functions:
+	block_errors -- per-block error by feature group, for all subjects
+	hidden_reps_tensor -- hidden representations as a 4D array
+	hidden_reps_distances -- relative distances between hidden representations
+	hidden_reps_pca -- first and last blocks hidden representations PCA
+	novelty_preference -- looking time contrasts for contrast test trials
+
+"""
+import os
+import re
+import numpy as np
+
+# Factor levels, in the order used by Experiment output methods and R scripts
+CONDITIONS = ("no_label", "label")
+ERROR_TYPES = ("label", "salient", "non_salient")
+CONTRAST_TYPES = ("Head", "Tail")
+FEATURES = ("Old", "New")
+TAIL_TYPES = ("A", "B")
+HEAD_TYPES = ("1", "2")
+
+def _levels_index(column, levels):
+	"""Code a column of strings as indices into levels."""
+	index = np.full(column.shape, -1, dtype=int)
+	for i, level in enumerate(levels):
+		index[column == level] = i
+	if np.any(index < 0):
+		raise ValueError("Unknown levels " + str(np.unique(column[index < 0])))
+	return index
+
+def _read_csv(filename):
+	"""Read a csv file into a dictionary of column arrays."""
+	table = np.genfromtxt(filename, delimiter=',', names=True,
+						  dtype=None, encoding="utf-8")
+	return {name: table[name] for name in table.dtype.names}
+
+def _salience_ratio(filename):
+	"""Get the salience ratio from the file number, as in stats/Routines.R."""
+	return int(re.findall(r"_(\d+)", os.path.basename(filename))[0]) / 10
+
+def _list_files(res_repo, suffix):
+	"""List result files with given suffix, preferring up-to-date binary copies."""
+	filenames = []
+	for f in sorted(os.listdir(res_repo)):
+		if suffix in f and f.endswith(".csv"):
+			npz = f[:-len(".csv")] + ".npz"
+			if os.path.exists(os.path.join(res_repo, npz)) and \
+			   os.path.getmtime(os.path.join(res_repo, npz)) >= \
+			   os.path.getmtime(os.path.join(res_repo, f)):
+				f = npz
+			filenames.append(os.path.join(res_repo, f))
+	return filenames
+
+def _read_all(res_repo, suffix, read_file):
+	"""Read all files with given suffix and bind them together.
+
+	Subject numbers are offset by the number of subjects in previous
+	files, and a salience_ratio column is added.
+
+	"""
+	filenames = _list_files(res_repo, suffix)
+	if not filenames:
+		raise FileNotFoundError("No " + suffix + " files in " + res_repo)
+	data = []
+	offset = 0
+	for filename in filenames:
+		d = read_file(filename)
+		d["salience_ratio"] = np.full(d["subject"].shape,
+									  _salience_ratio(filename))
+		d["subject"] = d["subject"] + offset
+		offset = d["subject"].max() + 1
+		data.append(d)
+	return {key: np.concatenate([d[key] for d in data]) for key in data[0]}
+
+def _load(filename, from_csv):
+	"""Load a data set from a .npz file, or from a .csv file with from_csv."""
+	if filename.endswith(".npz"):
+		with np.load(filename) as f:
+			return {key: f[key] for key in f.files}
+	return from_csv(_read_csv(filename))
+
+def _fam_errors_from_csv(table):
+	return {"subject": table["subject"].astype(int),
+			"condition": _levels_index(table["condition"], CONDITIONS),
+			"block": table["block"].astype(int),
+			"error_type": _levels_index(table["error_type"], ERROR_TYPES),
+			"error": table["error"].astype(float)}
+
+def _fam_hidden_reps_from_csv(table):
+	dims = sorted([key for key in table if key.startswith("dim")],
+				  key=lambda key: int(key[3:]))
+	stim_type = table["stim_type"].astype(str)
+	return {"subject": table["subject"].astype(int),
+			"condition": _levels_index(table["condition"], CONDITIONS),
+			"block": table["block"].astype(int),
+			"tail_type": _levels_index(np.array([s[0] for s in stim_type]),
+									   TAIL_TYPES),
+			"head_type": _levels_index(np.array([s[1:] for s in stim_type]),
+									   HEAD_TYPES),
+			"h_rep": np.column_stack([table[d].astype(float) for d in dims])}
+
+def _contrast_trials_from_csv(table):
+	return {"subject": table["subject"].astype(int),
+			"condition": _levels_index(table["condition"], CONDITIONS),
+			"contrast_type": _levels_index(table["contrast_type"],
+										   CONTRAST_TYPES),
+			"feature": _levels_index(table["feature"], FEATURES),
+			"looking_time": table["looking_time"].astype(float)}
+
+# Result file name patterns, with their csv conversion functions
+_FROM_CSV = (("_errors", _fam_errors_from_csv),
+			 ("_hidden_reps", _fam_hidden_reps_from_csv),
+			 ("contrast_test_trials", _contrast_trials_from_csv))
+
+def convert_results(res_repo="../results/data/"):
+	"""Write a binary .npz copy of each result csv file in res_repo.
+
+	Copies hold the data of their csv file only (no subject offset nor
+	salience_ratio column, added when reading), and are read instead of
+	csv files that are not newer than them.
+	Return the list of written files.
+
+	"""
+	written = []
+	for suffix, from_csv in _FROM_CSV:
+		for filename in _list_files(res_repo, suffix):
+			if filename.endswith(".npz"):
+				# Binary copy already up to date
+				continue
+			npz = filename[:-len(".csv")] + ".npz"
+			np.savez(npz, **_load(filename, from_csv))
+			written.append(npz)
+	return written
+
+def read_fam_errors(res_repo="../results/data/"):
+	"""Read all familiarisation errors files from res_repo.
+
+	Return a dictionary with columns subject, condition, block,
+	error_type, error, and salience_ratio.
+
+	"""
+	return _read_all(res_repo, "_errors",
+					 lambda f: _load(f, _fam_errors_from_csv))
+
+def read_fam_hidden_reps(res_repo="../results/data/"):
+	"""Read all familiarisation hidden representations files from res_repo.
+
+	Return a dictionary with columns subject, condition, block, tail_type,
+	head_type, salience_ratio, and h_rep. h_rep is a 2D array with one row
+	per hidden representation, and one column per hidden dimension.
+
+	"""
+	return _read_all(res_repo, "_hidden_reps",
+					 lambda f: _load(f, _fam_hidden_reps_from_csv))
+
+def read_contrast_trials(res_repo="../results/data/"):
+	"""Read all contrast test trials files from res_repo.
+
+	Return a dictionary with columns subject, condition, contrast_type,
+	feature, looking_time, and salience_ratio.
+
+	"""
+	return _read_all(res_repo, "contrast_test_trials",
+					 lambda f: _load(f, _contrast_trials_from_csv))
+
+def _subject_info(data, subjects):
+	"""Get condition and salience ratio for each subject in subjects."""
+	_, first = np.unique(data["subject"], return_index=True)
+	return {"subject": subjects,
+			"condition": data["condition"][first],
+			"salience_ratio": data["salience_ratio"][first]}
+
+def block_errors(fam_errors):
+	"""Compute per-block error by feature group for all subjects.
+
+	Return a tuple (errors, blocks, subjects) with errors a 3D array of
+	shape (n_subjects, n_blocks, len(ERROR_TYPES)), and subjects a
+	dictionary of per-subject subject, condition and salience_ratio.
+	Missing values (block not recorded for a subject) are set to nan.
+
+	"""
+	subjects, s_i = np.unique(fam_errors["subject"], return_inverse=True)
+	blocks, b_i = np.unique(fam_errors["block"], return_inverse=True)
+	errors = np.full((subjects.size, blocks.size, len(ERROR_TYPES)), np.nan)
+	errors[s_i, b_i, fam_errors["error_type"]] = fam_errors["error"]
+	return errors, blocks, _subject_info(fam_errors, subjects)
+
+def hidden_reps_tensor(fam_hidden_reps):
+	"""Arrange hidden representations as a 4D array.
+
+	Return a tuple (h_reps, tail_types, blocks, subjects), with h_reps of
+	shape (n_subjects, n_blocks, n_stims, n_dims) and tail_types of shape
+	(n_stims,). Stimuli are ordered by tail type, then by presentation
+	order within each block. Blocks not recorded for a subject (e.g. with
+	an AdaptiveSchedule) are filled with nan. Every recorded block must
+	have the same number of stimuli per tail type.
+
+	"""
+	subjects, s_i = np.unique(fam_hidden_reps["subject"], return_inverse=True)
+	blocks, b_i = np.unique(fam_hidden_reps["block"], return_inverse=True)
+	tail_type = fam_hidden_reps["tail_type"]
+	order = np.lexsort((tail_type, b_i, s_i))
+	# Index (subject, block) groups, each group holding n_stims rows
+	groups, counts = np.unique(s_i * blocks.size + b_i, return_counts=True)
+	n_stims = counts[0]
+	if np.any(counts != n_stims):
+		raise ValueError("Unbalanced number of hidden representations")
+	h_rep = fam_hidden_reps["h_rep"]
+	h_reps = np.full((subjects.size * blocks.size, n_stims, h_rep.shape[1]),
+					 np.nan)
+	h_reps[groups] = h_rep[order].reshape(groups.size, n_stims, -1)
+	tail_types = tail_type[order][:n_stims]
+	if np.any(tail_type[order].reshape(groups.size, n_stims) != tail_types):
+		raise ValueError("Unbalanced tail types across subjects and blocks")
+	return (h_reps.reshape(subjects.size, blocks.size, n_stims, -1),
+			tail_types, blocks, _subject_info(fam_hidden_reps, subjects))
+
+def _mean_pairwise_dist(items):
+	"""Mean euclidean distance between all pairs of items on axis -2."""
+	n = items.shape[-2]
+	diffs = items[..., :, None, :] - items[..., None, :, :]
+	dists = np.linalg.norm(diffs, axis=-1)
+	i, j = np.triu_indices(n, k=1)
+	return dists[..., i, j].mean(axis=-1)
+
+def hidden_reps_distances(fam_hidden_reps):
+	"""Compute relative distances between hidden representations.
+
+	For each subject, block and tail type, the absolute distance is the
+	mean distance between all hidden representations of that tail type.
+	The between distance is the distance between the mean hidden
+	representations of each tail type. The relative distance is the
+	absolute distance divided by the between distance.
+
+	Return a tuple (relative_dist, blocks, subjects), with relative_dist
+	of shape (n_subjects, n_blocks, len(TAIL_TYPES)). Blocks not recorded
+	for a subject are set to nan.
+
+	"""
+	h_reps, tail_types, blocks, subjects = hidden_reps_tensor(fam_hidden_reps)
+	by_tail = np.stack([h_reps[:, :, tail_types == t]
+						for t in range(len(TAIL_TYPES))], axis=2)
+	absolute_dist = _mean_pairwise_dist(by_tail)
+	between_dist = _mean_pairwise_dist(by_tail.mean(axis=3))
+	return absolute_dist / between_dist[..., None], blocks, subjects
+
+def hidden_reps_pca(fam_hidden_reps, rank=2):
+	"""Project hidden representations of first and last blocks on their PCs.
+
+	PCA is computed for each subject and block separately, as in
+	stats/HiddenRepresentations.R. Signs being arbitrary, each component
+	is oriented so that the mean of tail type A items is positive.
+	First and last blocks are the first and last blocks recorded for each
+	subject.
+
+	Return a tuple (projections, tail_types, subjects), with projections
+	of shape (n_subjects, 2, n_stims, rank) for first and last blocks.
+
+	"""
+	h_reps, tail_types, blocks, subjects = hidden_reps_tensor(fam_hidden_reps)
+	recorded = ~np.isnan(h_reps).any(axis=(2, 3))
+	first = np.argmax(recorded, axis=1)
+	last = blocks.size - 1 - np.argmax(recorded[:, ::-1], axis=1)
+	h_reps = h_reps[np.arange(subjects["subject"].size)[:, None],
+					np.column_stack((first, last))]
+	centred = h_reps - h_reps.mean(axis=2, keepdims=True)
+	u, s, _ = np.linalg.svd(centred, full_matrices=False)
+	projections = u[..., :rank] * s[..., None, :rank]
+	signs = np.sign(projections[:, :, tail_types == 0].mean(axis=2))
+	signs[signs == 0] = 1
+	return projections * signs[:, :, None, :], tail_types, subjects
+
+def novelty_preference(contrast_trials):
+	"""Compute novelty preference for contrast test trials.
+
+	Novelty preference is the arcsine square root transform of the
+	proportion of looking time to the new stimulus, centred on chance.
+
+	Return a tuple (novelty_pref, subjects), with novelty_pref of shape
+	(n_subjects, len(CONTRAST_TYPES)).
+
+	"""
+	subjects, s_i = np.unique(contrast_trials["subject"], return_inverse=True)
+	looking_times = np.full((subjects.size, len(CONTRAST_TYPES),
+							 len(FEATURES)), np.nan)
+	looking_times[s_i, contrast_trials["contrast_type"],
+				  contrast_trials["feature"]] = contrast_trials["looking_time"]
+	old, new = looking_times[..., 0], looking_times[..., 1]
+	novelty_pref = np.arcsin(np.sqrt(new / (old + new))) - np.arcsin(np.sqrt(.5))
+	return novelty_pref, _subject_info(contrast_trials, subjects)
+
+def main(res_repo="../results/data/"):
+	"""Print a summary of all available results in res_repo."""
+	fam_errors = read_fam_errors(res_repo)
+	errors, blocks, subjects = block_errors(fam_errors)
+	print("Familiarisation errors (last block, mean over subjects)")
+	for ratio in np.unique(subjects["salience_ratio"]):
+		for c, condition in enumerate(CONDITIONS):
+			s = (subjects["salience_ratio"] == ratio) & \
+				(subjects["condition"] == c)
+			means = np.nanmean(errors[s, -1], axis=0)
+			print(ratio, condition, *["{:.4f}".format(m) for m in means])
+	contrast_trials = read_contrast_trials(res_repo)
+	novelty_pref, subjects = novelty_preference(contrast_trials)
+	print("Novelty preference (mean over subjects)")
+	for ratio in np.unique(subjects["salience_ratio"]):
+		for c, condition in enumerate(CONDITIONS):
+			s = (subjects["salience_ratio"] == ratio) & \
+				(subjects["condition"] == c)
+			means = novelty_pref[s].mean(axis=0)
+			print(ratio, condition, *["{:.4f}".format(m) for m in means])
+
+if __name__ == "__main__":
+	main()
@@ -6,6 +6,8 @@ import copy
 
 from collections import deque
 
+import Backends as bk
+
 def sigmf(m):
 	return 1 / (1 + np.exp(-m))
 
@@ -31,6 +33,9 @@ class BackPropNetwork(object):
 			Default value is an exponential decay function.
 			For the model to converge, sum(momentum) must be strictly less
 			than lrn_rates.
+		backend -- compute backend used to train the network, or its name
+			Available backends are given in Backends.BACKENDS.
+			Default value is the numpy reference backend.
 		
 	BackPropNetwork properties:
 		n_layers -- number of layers for the network
@@ -49,6 +54,7 @@ class BackPropNetwork(object):
 		momentum -- influence of inertial terms
 		inertial_memory -- number of inertial terms to keep in memory
 		error -- error of the network on the last presented stimulus
+		backend -- compute backend used by run
 	
 	BackPropNetwork methods:
 		init_weights_matrix
@@ -64,7 +70,7 @@ class BackPropNetwork(object):
 		
 	"""
 	def __init__(self,n_neurons,n_label,n_salient,
-				 lrn_rates,momentum=exp_decay):
+				 lrn_rates,momentum=exp_decay,backend=None):
 		"""Initialise a simple back-propagation neural network.
 		
 		See class documentation for more details about parameters.
@@ -96,6 +102,7 @@ class BackPropNetwork(object):
 									 [[lrn_rates[0]]])))
 		# Set limit size of inertia queue (according to momentum function)
 		self.momentum, self.inertia_memory = self.init_momentum(momentum)
+		self.backend = bk.get_backend(backend)
 	
 	def init_weights_matrix(self, m, n, bias = True):
 		"""Initialise weights as unfiform random values in [-0.25,0.25].
@@ -257,5 +264,4 @@ class BackPropNetwork(object):
 		# Set up goal if none specified
 		if goal is None:
 			goal = stimulus
-		self.propagate(stimulus)
-		self.backpropagate(goal)
+		self.backend.train_step(self, stimulus, goal)
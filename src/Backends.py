@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import copy
+import warnings
+import numpy as np
+
+try:
+	import numba
+except ImportError:
+	numba = None
+
+class NumpyBackend(object):
+	"""Reference compute backend, using BackPropNetwork numpy methods.
+
+	Backend methods:
+		train_step -- run propagation and backpropagation of a stimulus
+
+	"""
+	name = "numpy"
+
+	def train_step(self, net, stimulus, goal):
+		"""Run the full propagation+backpropagation of stimulus on net."""
+		net.propagate(stimulus)
+		net.backpropagate(goal)
+
+def _train_step(x, goal, w0, w1, i0, i1, lrs0, lr, momentum):
+	"""Compute a full training step of a single hidden layer network.
+
+	Follow BackPropNetwork.propagate and BackPropNetwork.backpropagate
+	with explicit loops, for a constant momentum only using the last
+	update values (i0 and i1). Weight matrices are not modified.
+
+	Return hidden and output activations, output error, updated weights,
+	and update values for both weight matrices.
+
+	"""
+	n_in, n_h = w0.shape[0] - 1, w0.shape[1]
+	n_out = w1.shape[1]
+	# Forward propagation, sigmoid gate to hidden layer, linear to output
+	h = np.empty((1, n_h))
+	for j in range(n_h):
+		a = w0[n_in, j]
+		for i in range(n_in):
+			a += x[0, i] * w0[i, j]
+		h[0, j] = 1 / (1 + np.exp(-a))
+	o = np.empty((1, n_out))
+	for k in range(n_out):
+		a = w1[n_h, k]
+		for j in range(n_h):
+			a += h[0, j] * w1[j, k]
+		o[0, k] = a
+	# Gradients for output and hidden layers, with offset term
+	error = o - goal
+	g1 = error * 1.1
+	g0 = np.empty((1, n_h))
+	for j in range(n_h):
+		a = 0.
+		for k in range(n_out):
+			a += g1[0, k] * w1[j, k]
+		g0[0, j] = a * (h[0, j] * (1 - h[0, j]) + .1)
+	# Update values and new weights
+	d0 = np.empty(w0.shape)
+	new_w0 = np.empty(w0.shape)
+	for i in range(n_in + 1):
+		x_i = x[0, i] if i < n_in else 1.
+		for j in range(n_h):
+			d0[i, j] = x_i * g0[0, j]
+			new_w0[i, j] = (w0[i, j] - d0[i, j] * lrs0[i, 0]
+							+ momentum * i0[i, j])
+	d1 = np.empty(w1.shape)
+	new_w1 = np.empty(w1.shape)
+	for j in range(n_h + 1):
+		h_j = h[0, j] if j < n_h else 1.
+		for k in range(n_out):
+			d1[j, k] = h_j * g1[0, k]
+			new_w1[j, k] = w1[j, k] - d1[j, k] * lr + momentum * i1[j, k]
+	return h, o, error, new_w0, new_w1, d0, d1
+
+if numba is not None:
+	_train_step_jit = numba.njit(cache=True)(_train_step)
+
+class NumbaBackend(NumpyBackend):
+	"""Compute backend running each training step as a JIT compiled kernel.
+
+	For tiny networks, the cost of a training step is dominated by the
+	overhead of numpy calls, which a single compiled kernel avoids.
+	Only networks with one hidden layer and a constant momentum are
+	supported, others are trained with the numpy reference backend.
+
+	"""
+	name = "numba"
+
+	def supports(self, net):
+		"""Return True if net can be trained with the compiled kernel."""
+		return (numba is not None and net.n_layers == 3
+				and isinstance(net.momentum, float))
+
+	def train_step(self, net, stimulus, goal):
+		if not self.supports(net):
+			return super().train_step(net, stimulus, goal)
+		# If no label units in model (i.e. STM model), remove label from goal
+		goal = goal[:, goal.shape[1] - net.neurons[-1].shape[1]:]
+		(h, o, error,
+		 w0, w1, d0, d1) = _train_step_jit(np.asarray(stimulus, dtype=float),
+										   np.asarray(goal, dtype=float),
+										   net.weights[0], net.weights[1],
+										   net.inertia[0][0], net.inertia[0][1],
+										   net.lrn_rates[1],
+										   float(net.lrn_rates[0]),
+										   net.momentum)
+		net.neurons = [stimulus, h, o]
+		net.error = error
+		net.weights = [w0, w1]
+		# Store new deltas in the inertia of the network, forget too old ones
+		net.inertia.appendleft([d0, d1])
+		if len(net.inertia) > net.inertia_memory:
+			net.inertia.pop()
+
+BACKENDS = {"numpy": NumpyBackend, "numba": NumbaBackend}
+
+def get_backend(backend):
+	"""Return a backend instance from a backend or a backend name.
+
+	Fall back to the numpy backend, with a warning, if the required
+	backend depends on a package that is not installed.
+
+	"""
+	if backend is None:
+		return NumpyBackend()
+	if not isinstance(backend, str):
+		return backend
+	if backend == "numba" and numba is None:
+		warnings.warn("numba is not installed, using numpy backend instead")
+		return NumpyBackend()
+	return BACKENDS[backend]()
+
+def _max_diff(a, b):
+	"""Maximum absolute difference between two (nested lists of) arrays."""
+	if isinstance(a, np.ndarray):
+		return np.max(np.abs(a - b))
+	return max(_max_diff(x, y) for x, y in zip(a, b))
+
+def compare_backends(backend, n_steps=1000, n_neurons=(28, 6, 28),
+					 seed=0):
+	"""Check that backend trains networks like the numpy reference backend.
+
+	Train two identical networks on the same random stimuli, one with
+	each backend, and return the maximum absolute difference between
+	their weights, error, neurons and inertia after n_steps training steps.
+	Return None if backend cannot train such networks itself (e.g. if
+	its dependencies are not installed), as it would defer to numpy.
+
+	"""
+	import BackPropNetworks as bpn
+	np.random.seed(seed)
+	ref = bpn.BackPropNetwork(list(n_neurons), 8, 10, (.01, .01, .005),
+							  .0025, backend="numpy")
+	net = copy.deepcopy(ref)
+	net.backend = BACKENDS[backend]()
+	if hasattr(net.backend, "supports") and not net.backend.supports(net):
+		return None
+	stims = np.random.uniform(size=(n_steps, 1, n_neurons[0]))
+	for stim in stims:
+		ref.run(stim)
+		net.run(stim)
+	if len(ref.inertia) != len(net.inertia):
+		return np.inf
+	return max(_max_diff(ref.weights, net.weights),
+			   _max_diff(ref.error, net.error),
+			   _max_diff(ref.neurons, net.neurons),
+			   _max_diff(list(ref.inertia), list(net.inertia)))
@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import numpy as np
-from multiprocessing import Pool
 
 from Subjects import *
+import Workers as wk
+import JobQueues as jq
 
 class Experiment(object):
 	"""Global class for salience-diagnosticity experiments.
@@ -22,12 +23,27 @@ class Experiment(object):
 		threshold -- error threshold for model "looking away"
 		n_blocks -- number of test blocks
 		h_ratio -- ratios from output to hidden layer for networks
+		rec_schedule -- blocks at which to record familiarisation results
+			Either a RecordingSchedule from Schedules, a recording interval,
+			or a list of blocks. First and last blocks are always recorded.
+			Default value is to record every 50 blocks.
+		backend -- name of the compute backend for subject networks
+			Available backends are given in Backends.BACKENDS. Backends
+			depending on packages that are not installed fall back to numpy.
+		n_processes -- number of worker processes for run_experiment
+		blas_threads -- number of BLAS threads per worker process
+			When None, n_processes and blas_threads are planned from the
+			number of available CPUs and the network size.
+		pin_workers -- whether to pin each worker process to its own CPUs
 	
 	Experiment properties:
 		pres_time -- max number of presentations at familiarisation
 		threshold -- "looking away" threshold at familiarisation
 		n_trials -- number of familiarisation trials
 		h_ratio -- n_hidden_neurons / n_output_neurons ratio
+		rec_schedule -- recording schedule for familiarisation results
+		backend -- compute backend name for subject networks
+		n_processes, blas_threads, pin_workers -- worker planning options
 		lrn_rate -- learning rate for the network
 		momentum -- momentum parameter for the network
 		l_size, t_size, b_size, h_size -- modality sizes for different features
@@ -40,13 +56,19 @@ class Experiment(object):
 	
 	Experiment methods:
 		run_experiment -- run a ful experiment, using only class properties
+		run_pool -- run all subjects in a local pool of worker processes
+		publish -- publish all subjects as jobs in a shared queue
+		collect -- wait for results of subjects published in a shared queue
+		run_subject -- run familiarisation and test trials for one subject
 		generate_stims -- generate physical stimuli with overlap
 		output_data -- convert results data to a csv file
 	
 	"""
 	
 	def __init__(self, modality_sizes, overlap_ratio, lrn_rates,
-				 n_subjects, n_fam_pres, test_pres_time, threshold, h_ratio):
+				 n_subjects, n_fam_pres, test_pres_time, threshold, h_ratio,
+				 rec_schedule=50, backend="numpy", n_processes=None,
+				 blas_threads=None, pin_workers=False):
 		"""Initialise a labeltime experiment.
 		
 		See class documentation for more details about parameters.
@@ -56,6 +78,11 @@ class Experiment(object):
 		self.test_pres_time = test_pres_time
 		self.threshold = threshold
 		self.h_ratio = h_ratio
+		self.rec_schedule = rec_schedule
+		self.backend = backend
+		self.n_processes = n_processes
+		self.blas_threads = blas_threads
+		self.pin_workers = pin_workers
 		# Learning rates and momentum
 		self.lrn_rates = lrn_rates
 		self.momentum = .0025
@@ -176,17 +203,17 @@ class Experiment(object):
 		s_type = format(subject_i%4,'02b') # type: str
 		# Create subject
 		s = Subject(self.l_size+self.h_size+self.t_size, self.l_size, self.h_size,
-					self.h_ratio, self.lrn_rates, self.momentum)
+					self.h_ratio, self.lrn_rates, self.momentum, self.backend)
 		# Run familiarisation
 		fam_results = s.fam_training(self.fam_stims[int(s_type[0])],
-									 self.n_fam_pres, 50)
+									 self.n_fam_pres, self.rec_schedule)
 		# Run contrast test trials
 		contrast_results = s.contrast_test(self.contrast_stims[int(s_type[1])],
 										   self.test_pres_time, self.threshold)
 		# Return results
 		return fam_results, contrast_results
 		
-	def run_experiment(self):
+	def run_experiment(self, queue_dir=None, queue_timeout=None):
 		"""Run a full experiment.
 		
 		Return a tuple of results for familiarisation and training. Results
@@ -196,23 +223,75 @@ class Experiment(object):
 		exploration overlap appended to it.
 		Each subject's training results is a the subject itself after
 		background training. This allows us to find any information we want.
+		If queue_dir is given, subjects are published as jobs in the
+		JobQueues.DirectoryQueue at queue_dir instead of being run locally,
+		and are run by workers started separately (see JobQueues.main).
+		If queue_timeout is also given, jobs whose workers have not
+		refreshed their claim for queue_timeout seconds (e.g. dead workers)
+		are run again. It must be longer than JobQueues.HEARTBEAT.
+		
+		"""
+		if queue_dir is not None:
+			exp_id = self.publish(queue_dir, queue_timeout)
+			return self.collect(queue_dir, exp_id, queue_timeout)
+		return self.split_results(self.run_pool())
+	
+	def publish(self, queue_dir, queue_timeout=None):
+		"""Publish all subjects as jobs in the queue at queue_dir.
+		
+		Return the experiment id, to give to collect. Publishing several
+		experiments before collecting any lets workers run them all at once.
+		queue_timeout is only checked here, before any job is published.
+		
+		"""
+		jq.check_timeout(queue_timeout)
+		return jq.DirectoryQueue(queue_dir).publish(self, range(self.n_subjects))
+	
+	def collect(self, queue_dir, exp_id, queue_timeout=None):
+		"""Wait for results of experiment exp_id published with publish.
+		
+		Return results as run_experiment does.
+		
+		"""
+		results = jq.DirectoryQueue(queue_dir).collect(exp_id,
+													   timeout=queue_timeout)
+		return self.split_results(results)
+	
+	def split_results(self, results):
+		"""Split run_subject results into familiarisation and contrast results."""
+		fam_results = {}
+		contrast_results = {}
+		for subject_i in range(self.n_subjects):
+			fam_results[subject_i] = results[subject_i][0]
+			contrast_results[subject_i] = results[subject_i][1]
+		return fam_results, contrast_results
+	
+	def run_pool(self):
+		"""Run all subjects in a local pool of worker processes.
+		
+		Return a dictionary of run_subject results, with subject number as key.
 		
 		"""
 		# Initialise result gatherer as a dictionary (subject number as key)
 		results_async = {}
+		# Plan worker processes from network size
+		# Subjects are trained one stimulus at a time (batch size of 1)
+		stim_size = self.l_size + self.h_size + self.t_size
+		plan = wk.plan_workers(self.n_subjects,
+							   (stim_size, int(stim_size * self.h_ratio), stim_size),
+							   batch_size=1,
+							   n_processes=self.n_processes,
+							   blas_threads=self.blas_threads,
+							   pin=self.pin_workers)
 		# Start running subjects
-		with Pool() as pool:
+		with plan.pool() as pool:
 			for subject_i in range(self.n_subjects):
 				results_async[subject_i] = pool.apply_async(self.run_subject,
 															[subject_i])
 			pool.close()
 			pool.join()
-		fam_results = {}
-		contrast_results = {}
-		for subject_i in range(self.n_subjects):
-			fam_results[subject_i] = results_async[subject_i].get()[0]
-			contrast_results[subject_i] = results_async[subject_i].get()[1]
-		return fam_results, contrast_results
+		return {subject_i: results_async[subject_i].get()
+				for subject_i in range(self.n_subjects)}
 	
 	def output_fam_data(data, filename):
 		"""Write data from familiarisation into a filename.csv file.
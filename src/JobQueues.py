@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import time
+import pickle
+import shutil
+import socket
+import argparse
+import threading
+import traceback
+import multiprocessing as mp
+import numpy as np
+
+import Workers as wk
+
+# Seconds between two refreshes of the lock of a running job. Stale claim
+# timeouts given to collect must be longer than this.
+HEARTBEAT = 10.
+
+def check_timeout(timeout):
+	"""Raise a ValueError if timeout is too short for stale claims."""
+	if timeout is not None and timeout <= HEARTBEAT:
+		raise ValueError("Stale claim timeout ({}s) must be longer than "
+						 "HEARTBEAT ({}s), or running jobs are run twice"
+						 .format(timeout, HEARTBEAT))
+
+class DirectoryQueue(object):
+	"""Job queue shared between hosts through a common directory.
+
+	A coordinator publishes an experiment as a set of (subject, seed)
+	jobs, and worker processes on any host with access to the directory
+	claim jobs, run them, and push results back. Claims use lock files
+	created atomically, so that each job is only run once. Workers refresh
+	the lock of their running job every HEARTBEAT seconds, so that only
+	claims of dead workers go stale.
+
+	Input parameters:
+		path -- path of the shared queue directory
+
+	Queue layout:
+		path/<exp_id>/experiment.pkl -- pickled Experiment
+		path/<exp_id>/jobs/<subject>.pkl -- pickled (subject, seed)
+		path/<exp_id>/locks/<subject>.lock -- claim, contains host:pid
+		path/<exp_id>/results/<subject>.pkl -- pickled run_subject results
+		path/<exp_id>/results/<subject>.err -- traceback of a failed job
+		path/STOP -- tells workers to stop once their current job is done
+			It stays in place until removed with resume, and workers
+			started meanwhile exit immediately.
+
+	DirectoryQueue methods:
+		publish -- publish jobs for all subjects of an experiment
+		collect -- wait for and gather all results of an experiment
+		claim -- claim a pending job, from any published experiment
+		load_experiment -- load a published experiment
+		push -- push the results of a job
+		push_error -- push the traceback of a failed job
+		heartbeat -- refresh the claim of a running job
+		requeue_stale -- make jobs with stale claims available again
+		stop -- tell workers to stop
+		resume -- allow workers to run again after stop
+		stopped -- whether workers have been told to stop
+
+	"""
+	def __init__(self, path):
+		self.path = path
+		os.makedirs(path, exist_ok=True)
+
+	def _write(self, filename, obj):
+		"""Pickle obj into filename atomically, through a temporary file."""
+		tmp = filename + ".{}-{}.tmp".format(socket.gethostname(), os.getpid())
+		with open(tmp, 'wb') as f:
+			pickle.dump(obj, f)
+		os.replace(tmp, filename)
+
+	def _lock(self, exp_id, subject_i):
+		return os.path.join(self.path, exp_id, "locks", str(subject_i) + ".lock")
+
+	def _read(self, filename):
+		with open(filename, 'rb') as f:
+			return pickle.load(f)
+
+	def publish(self, experiment, subjects, seeds=None):
+		"""Publish jobs for subjects of experiment, return the experiment id.
+
+		Each job is given a random seed (from numpy's global generator
+		unless seeds is given), set by the worker before running it.
+
+		"""
+		subjects = list(subjects)
+		if seeds is None:
+			seeds = np.random.randint(2**31, size=len(subjects))
+		exp_id = "{}-{}-{}".format(time.strftime("%Y%m%d%H%M%S"),
+								   socket.gethostname(), os.getpid())
+		while os.path.exists(os.path.join(self.path, exp_id)):
+			exp_id += "_"
+		exp_dir = os.path.join(self.path, exp_id)
+		for d in ("jobs", "locks", "results"):
+			os.makedirs(os.path.join(exp_dir, d))
+		# Experiment must be available before any job is
+		self._write(os.path.join(exp_dir, "experiment.pkl"), experiment)
+		for subject_i, seed in zip(subjects, seeds):
+			self._write(os.path.join(exp_dir, "jobs", str(subject_i) + ".pkl"),
+						(subject_i, int(seed)))
+		return exp_id
+
+	def claim(self):
+		"""Claim a pending job.
+
+		Return a tuple (exp_id, subject, seed), or None if no job is
+		pending.
+
+		"""
+		try:
+			exp_ids = sorted(os.listdir(self.path))
+		except FileNotFoundError:
+			return None
+		for exp_id in exp_ids:
+			exp_dir = os.path.join(self.path, exp_id)
+			try:
+				jobs = sorted(os.listdir(os.path.join(exp_dir, "jobs")))
+			except (FileNotFoundError, NotADirectoryError):
+				continue
+			for job in jobs:
+				if not job.endswith(".pkl"):
+					continue
+				lock = self._lock(exp_id, job[:-len(".pkl")])
+				try:
+					fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+				except (FileExistsError, FileNotFoundError):
+					continue
+				with os.fdopen(fd, 'w') as f:
+					f.write("{}:{}\n".format(socket.gethostname(), os.getpid()))
+				try:
+					subject_i, seed = self._read(os.path.join(exp_dir, "jobs", job))
+				except FileNotFoundError:
+					# Experiment collected and removed meanwhile
+					continue
+				return exp_id, subject_i, seed
+		return None
+
+	def load_experiment(self, exp_id):
+		"""Load the experiment published as exp_id."""
+		return self._read(os.path.join(self.path, exp_id, "experiment.pkl"))
+
+	def _push(self, exp_id, filename, obj):
+		"""Write obj into results of exp_id, unless already collected."""
+		try:
+			self._write(os.path.join(self.path, exp_id, "results", filename),
+						obj)
+		except FileNotFoundError:
+			# Experiment collected (e.g. from a requeued duplicate of this job)
+			pass
+
+	def push(self, exp_id, subject_i, results):
+		"""Push results of subject_i for experiment exp_id.
+
+		Results for an experiment that has already been collected are
+		ignored.
+
+		"""
+		self._push(exp_id, str(subject_i) + ".pkl", results)
+
+	def push_error(self, exp_id, subject_i, error):
+		"""Push the traceback (a str) of failed subject_i for exp_id."""
+		self._push(exp_id, str(subject_i) + ".err", error)
+
+	def heartbeat(self, exp_id, subject_i):
+		"""Refresh the claim on subject_i for exp_id, so that it is not stale."""
+		try:
+			os.utime(self._lock(exp_id, subject_i))
+		except FileNotFoundError:
+			pass
+
+	def requeue_stale(self, exp_id, timeout):
+		"""Remove claims not refreshed for timeout seconds, with no results.
+
+		Used to run again jobs of workers that died while running them.
+		timeout must be longer than HEARTBEAT, otherwise jobs still running
+		are run twice.
+
+		"""
+		exp_dir = os.path.join(self.path, exp_id)
+		now = time.time()
+		for lock in os.listdir(os.path.join(exp_dir, "locks")):
+			name = lock[:-len(".lock")]
+			lock = os.path.join(exp_dir, "locks", lock)
+			result = os.path.join(exp_dir, "results", name + ".pkl")
+			try:
+				if not os.path.exists(result) \
+				   and now - os.path.getmtime(lock) > timeout:
+					os.remove(lock)
+			except FileNotFoundError:
+				pass
+
+	def collect(self, exp_id, poll=1., timeout=None):
+		"""Wait for all results of experiment exp_id, and remove it from queue.
+
+		Return a dictionary of results, with subject number as key.
+		If timeout is given, jobs whose claims have not been refreshed for
+		timeout seconds (see HEARTBEAT) are made available to workers again.
+		If a job failed, remove the experiment from queue and raise a
+		RuntimeError with the traceback from the worker.
+		Raise a ValueError if timeout is not longer than HEARTBEAT.
+
+		"""
+		check_timeout(timeout)
+		exp_dir = os.path.join(self.path, exp_id)
+		subjects = [job[:-len(".pkl")]
+					for job in os.listdir(os.path.join(exp_dir, "jobs"))
+					if job.endswith(".pkl")]
+		results_dir = os.path.join(exp_dir, "results")
+		while True:
+			done = set(os.listdir(results_dir))
+			errors = sorted(f for f in done if f.endswith(".err"))
+			if errors:
+				error = self._read(os.path.join(results_dir, errors[0]))
+				shutil.rmtree(exp_dir, ignore_errors=True)
+				raise RuntimeError("Subject {} failed in experiment {}:\n{}"
+								   .format(errors[0][:-len(".err")], exp_id,
+										   error))
+			if all(s + ".pkl" in done for s in subjects):
+				break
+			if timeout is not None:
+				self.requeue_stale(exp_id, timeout)
+			time.sleep(poll)
+		results = {}
+		for s in subjects:
+			results[int(s)] = self._read(os.path.join(results_dir, s + ".pkl"))
+		# Workers may still be pushing duplicates of requeued jobs
+		shutil.rmtree(exp_dir, ignore_errors=True)
+		return results
+
+	def stop(self):
+		"""Tell workers to stop once their current job is done."""
+		open(os.path.join(self.path, "STOP"), 'w').close()
+
+	def resume(self):
+		"""Remove the stop signal, so that new workers run jobs again."""
+		try:
+			os.remove(os.path.join(self.path, "STOP"))
+		except FileNotFoundError:
+			pass
+
+	def stopped(self):
+		"""Return True if workers have been told to stop."""
+		return os.path.exists(os.path.join(self.path, "STOP"))
+
+def _heartbeat(queue, exp_id, subject_i, done):
+	"""Refresh the claim of a running job until done is set."""
+	while not done.wait(HEARTBEAT):
+		queue.heartbeat(exp_id, subject_i)
+
+def run_worker(queue_dir, poll=1., exit_when_empty=False, blas_threads=1):
+	"""Run jobs from the queue in queue_dir until told to stop.
+
+	Set the job seed before running each subject, so that results do not
+	depend on which worker runs which job. If a job raises an exception,
+	its traceback is pushed as the job result instead, and the worker
+	goes on with the next job.
+	If exit_when_empty is True, also stop when no job is pending, once
+	at least one job has been run (so that workers can be started before
+	the coordinator publishes jobs).
+	Return the number of jobs run.
+
+	"""
+	wk.init_worker(blas_threads, None)
+	queue = DirectoryQueue(queue_dir)
+	experiments = {}
+	n_jobs = 0
+	while not queue.stopped():
+		# Forget experiments already collected
+		for exp_id in list(experiments):
+			if not os.path.isdir(os.path.join(queue_dir, exp_id)):
+				del experiments[exp_id]
+		job = queue.claim()
+		if job is None:
+			if exit_when_empty and n_jobs:
+				break
+			time.sleep(poll)
+			continue
+		exp_id, subject_i, seed = job
+		done = threading.Event()
+		heartbeat = threading.Thread(target=_heartbeat, daemon=True,
+									 args=(queue, exp_id, subject_i, done))
+		heartbeat.start()
+		try:
+			if exp_id not in experiments:
+				experiments[exp_id] = queue.load_experiment(exp_id)
+			np.random.seed(seed)
+			results = experiments[exp_id].run_subject(subject_i)
+		except Exception:
+			queue.push_error(exp_id, subject_i, traceback.format_exc())
+		else:
+			queue.push(exp_id, subject_i, results)
+		finally:
+			done.set()
+			heartbeat.join()
+		n_jobs += 1
+	return n_jobs
+
+def main():
+	parser = argparse.ArgumentParser(description="Run jobs from a shared directory queue.")
+	parser.add_argument("queue_dir", help="shared queue directory")
+	parser.add_argument("--workers", type=int, default=1,
+						help="number of local worker processes")
+	parser.add_argument("--poll", type=float, default=1.,
+						help="seconds between checks for new jobs")
+	parser.add_argument("--exit-when-empty", action="store_true",
+						help="stop when no job is pending, after running "
+						"at least one job")
+	parser.add_argument("--blas-threads", type=int, default=1,
+						help="BLAS threads per worker process")
+	parser.add_argument("--resume", action="store_true",
+						help="remove a previous stop signal before starting")
+	args = parser.parse_args()
+	if args.resume:
+		DirectoryQueue(args.queue_dir).resume()
+	worker_args = (args.queue_dir, args.poll, args.exit_when_empty,
+				   args.blas_threads)
+	workers = [mp.Process(target=run_worker, args=worker_args)
+			   for _ in range(args.workers)]
+	for w in workers:
+		w.start()
+	for w in workers:
+		w.join()
+
+if __name__ == "__main__":
+	main()
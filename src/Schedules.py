@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numbers
+import numpy as np
+
+class RecordingSchedule(object):
+	"""Global recording schedule class, deciding when to record results.
+
+	Blocks are numbered from 1 to n_blocks. The first and last blocks
+	are always recorded, as analyses compare them.
+
+	RecordingSchedule properties:
+		needs_errors -- whether observe must be called after each block
+		n_blocks -- number of blocks of the current run
+
+	RecordingSchedule methods:
+		start -- prepare the schedule for a run of n_blocks blocks
+		record -- whether to record results for a given block
+		observe -- give the schedule the mean error of a block
+
+	"""
+	needs_errors = False
+
+	def start(self, n_blocks):
+		"""Prepare the schedule for a run of n_blocks blocks."""
+		self.n_blocks = n_blocks
+
+	def record(self, block):
+		"""Return True if results must be recorded for block."""
+		return block == 1 or block == self.n_blocks
+
+	def observe(self, block, error):
+		"""Give the schedule the mean network error for block."""
+		pass
+
+class FixedSchedule(RecordingSchedule):
+	"""Record every rec_epoch blocks, as well as first and last blocks."""
+	def __init__(self, rec_epoch):
+		self.rec_epoch = rec_epoch
+
+	def record(self, block):
+		return not block % self.rec_epoch or super().record(block)
+
+class ListSchedule(RecordingSchedule):
+	"""Record an explicit list of blocks, as well as first and last blocks."""
+	def __init__(self, blocks):
+		self.blocks = frozenset(blocks)
+
+	def record(self, block):
+		return block in self.blocks or super().record(block)
+
+class LogSchedule(ListSchedule):
+	"""Record n_records blocks, log-spaced between first and last blocks.
+
+	Recording is dense at the start of training, where learning is fast,
+	and sparse later on. Fewer than n_records blocks are recorded when
+	log-spacing gives the same block more than once.
+
+	"""
+	def __init__(self, n_records):
+		self.n_records = n_records
+
+	def start(self, n_blocks):
+		super().start(n_blocks)
+		self.blocks = frozenset(np.rint(np.geomspace(1, n_blocks,
+													 self.n_records)).astype(int))
+
+class AdaptiveSchedule(RecordingSchedule):
+	"""Record blocks after which the network error changed enough.
+
+	Input parameters:
+		tolerance -- relative error change triggering a recording
+			The next block is recorded when the mean error of a block
+			differs from the error at the last recorded block by more
+			than tolerance times that error.
+		max_interval -- maximum number of blocks between two recordings
+
+	Recorded blocks differ between subjects. Analyses fill blocks missing
+	for a subject with nan.
+
+	"""
+	needs_errors = True
+
+	def __init__(self, tolerance=.05, max_interval=1000):
+		self.tolerance = tolerance
+		self.max_interval = max_interval
+
+	def start(self, n_blocks):
+		super().start(n_blocks)
+		self.last_block = None
+		self.last_error = None
+		self.next_block = None
+
+	def record(self, block):
+		if (block == self.next_block or super().record(block)
+			or block - self.last_block >= self.max_interval):
+			self.last_block = block
+			return True
+		return False
+
+	def observe(self, block, error):
+		if block == self.last_block:
+			# Block was recorded, use its error as new reference
+			self.last_error = error
+		elif abs(error - self.last_error) > self.tolerance * self.last_error:
+			self.next_block = block + 1
+
+def make_schedule(schedule):
+	"""Return a RecordingSchedule from a schedule specification.
+
+	schedule can be a RecordingSchedule, an integer (recording interval as in
+	FixedSchedule), or a list of blocks (as in ListSchedule).
+
+	"""
+	if isinstance(schedule, RecordingSchedule):
+		return schedule
+	if isinstance(schedule, numbers.Integral):
+		return FixedSchedule(schedule)
+	return ListSchedule(schedule)
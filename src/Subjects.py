@@ -4,6 +4,7 @@ import copy as cp
 import numpy as np
 
 import BackPropNetworks as bpn
+import Schedules as sch
 
 class Subject(object):
 	"""Global subject class with methods common to all subject types.
@@ -21,6 +22,7 @@ class Subject(object):
 		h_ratio -- ratio of hidden neurons compared to input neurons
 		lrn_rates -- learning rates of the backpropagation network
 		momentum -- influence of inertial term in [0, 1], or function
+		backend -- compute backend for the network, or its name
 	
 	Subject properties:
 		stims -- tuple of two prototype stimuli of same size
@@ -36,7 +38,8 @@ class Subject(object):
 	
 	"""
 	
-	def __init__(self, stim_size, n_label, n_salient, h_ratio, lrn_rates, momentum=None):
+	def __init__(self, stim_size, n_label, n_salient, h_ratio, lrn_rates, momentum=None,
+				 backend=None):
 		"""Initialise a simple subject from SalienceDiagnosticityEmpirical.
 		
 		See class documentation for more details about parameters.
@@ -48,20 +51,26 @@ class Subject(object):
 		n_hidden = int(n_output * h_ratio)
 		if momentum:
 			self.net = bpn.BackPropNetwork([n_input, n_hidden, n_output],
-										   n_label, n_salient, lrn_rates, momentum)
+										   n_label, n_salient, lrn_rates, momentum,
+										   backend=backend)
 		else:
 			self.net = bpn.BackPropNetwork([n_input, n_hidden, n_output],
-										   n_label, n_salient, lrn_rates)
+										   n_label, n_salient, lrn_rates,
+										   backend=backend)
 	
-	def fam_training(self, stims, n_steps, rec_epoch):
+	def fam_training(self, stims, n_steps, rec_schedule):
 		"""Compute the familiarisation phase for SalienceDiagnosticityEmpirical.
 		
-		Return network errors and hidden representations at specified epochs.
+		Return network errors and hidden representations at blocks given
+		by rec_schedule, a RecordingSchedule or a specification accepted
+		by Schedules.make_schedule (e.g. a recording interval).
 		
 		"""
 		# Initialise outputs
 		h_reps = {}
 		errors = {}
+		rec_schedule = sch.make_schedule(rec_schedule)
+		rec_schedule.start(n_steps)
 		# Indices for errors for groups of units
 		i_label = self.net.n_label
 		i_salient = self.net.n_label + self.net.n_salient
@@ -72,6 +81,7 @@ class Subject(object):
 		np.random.shuffle(stims_i[0])
 		np.random.shuffle(stims_i[1])
 		for step in range(n_steps):
+			record = rec_schedule.record(1+step)
 			block_h_reps = {}
 			label_errors = []
 			salient_errors = []
@@ -80,20 +90,26 @@ class Subject(object):
 				for cat in range(2):
 					# Train the network on an exemplar from each category
 					self.net.run(stims[cat][stims_i[cat][stim]])
-					if not (1+step) % rec_epoch or step==n_steps-1 or step == 0:
+					if record:
 						# Save hidden representation and stim type
 						stim_type = str(cat) + str(stims_i[cat][stim])
 						block_h_reps[stim_type] = self.net.neurons[1]
+					if record or rec_schedule.needs_errors:
 						# Save error
 						label_errors.append(np.linalg.norm(self.net.error[0, :i_label]))
 						salient_errors.append(np.linalg.norm(self.net.error[0, i_label:i_salient]))
 						non_salient_errors.append(np.linalg.norm(self.net.error[0, i_salient:]))
-			if not (1+step) % rec_epoch or step==n_steps-1 or step == 0:
+			if not (record or rec_schedule.needs_errors):
+				continue
+			block_errors = [np.mean(label_errors),
+							np.mean(salient_errors),
+							np.mean(non_salient_errors)]
+			if rec_schedule.needs_errors:
+				rec_schedule.observe(1+step, np.sum(block_errors))
+			if record:
 				# Save hidden representations and errors
 				h_reps[1+step] = block_h_reps
-				errors[1+step] = [np.mean(label_errors),
-								  np.mean(salient_errors),
-								  np.mean(non_salient_errors)]
+				errors[1+step] = block_errors
 		return errors, h_reps
 	
 	def contrast_test(self, contrast_stims, pres_time, threshold):
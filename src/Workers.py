@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import multiprocessing as mp
+
+try:
+	import threadpoolctl
+except ImportError:
+	threadpoolctl = None
+
+# Environment variables limiting threads of common BLAS implementations
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+				 "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS",
+				 "NUMEXPR_NUM_THREADS")
+# Below this number of matrix elements per operation, multithreaded BLAS
+# costs more in synchronisation than it saves in computation
+SMALL_WORK = 1 << 16
+# Maximum number of BLAS threads planned per worker, beyond which BLAS
+# scaling flattens for the matrix sizes used here
+MAX_BLAS_THREADS = 8
+
+# Keep threadpoolctl limits alive in worker processes
+_thread_limits = None
+
+def available_cpus():
+	"""Return the list of CPUs this process is allowed to run on."""
+	try:
+		return sorted(os.sched_getaffinity(0))
+	except AttributeError:
+		return list(range(os.cpu_count() or 1))
+
+class WorkerPlan(object):
+	"""Plan of worker processes for running subjects in parallel.
+
+	Input parameters:
+		n_processes -- number of worker processes
+		blas_threads -- number of BLAS threads per worker process
+		cpus -- list of CPUs to pin workers on, or None for no pinning
+			Each worker is pinned to its own set of blas_threads CPUs,
+			taken in order from cpus (wrapping around if needed).
+
+	WorkerPlan methods:
+		pool -- create a multiprocessing pool following the plan
+
+	"""
+	def __init__(self, n_processes, blas_threads, cpus=None):
+		self.n_processes = n_processes
+		self.blas_threads = blas_threads
+		self.cpus = cpus
+
+	def __repr__(self):
+		return ("WorkerPlan(n_processes={}, blas_threads={}, pinned={})"
+				.format(self.n_processes, self.blas_threads,
+						self.cpus is not None))
+
+	def pool(self):
+		"""Create a multiprocessing pool following the plan.
+
+		BLAS environment variables are also set in the current process
+		while the pool starts, so that workers started with spawn or
+		forkserver read them at start-up. Their previous values are then
+		restored.
+
+		"""
+		saved = {var: os.environ.get(var) for var in BLAS_ENV_VARS}
+		try:
+			for var in BLAS_ENV_VARS:
+				os.environ[var] = str(self.blas_threads)
+			# Shared counter giving each worker its own slot for pinning
+			slots = mp.Value('i', 0) if self.cpus is not None else None
+			return mp.Pool(self.n_processes, initializer=init_worker,
+						   initargs=(self.blas_threads, self.cpus, slots))
+		finally:
+			for var, value in saved.items():
+				if value is None:
+					os.environ.pop(var, None)
+				else:
+					os.environ[var] = value
+
+def plan_workers(n_tasks, layer_sizes, batch_size=1, n_processes=None,
+				 blas_threads=None, pin=False):
+	"""Choose numbers of worker processes and BLAS threads per worker.
+
+	n_tasks is the number of independent tasks (subjects) to run.
+	layer_sizes are the numbers of neurons per network layer, and
+	batch_size the number of stimuli (rows) per training step.
+	n_processes and blas_threads override the planned values if given.
+
+	BLAS threads per worker are chosen from the work size first. Small
+	networks trained one stimulus at a time get one BLAS thread per
+	worker, and one worker per CPU. Larger batched networks get one BLAS
+	thread per SMALL_WORK matrix elements, up to MAX_BLAS_THREADS, and
+	as many workers as CPUs allow. CPUs left over when there are fewer
+	tasks than workers are shared between BLAS threads, still up to
+	MAX_BLAS_THREADS. The total number
+	of threads never exceeds the number of available CPUs, unless forced
+	by n_processes and blas_threads.
+
+	"""
+	cpus = available_cpus()
+	n_cpus = len(cpus)
+	if blas_threads is None:
+		work = batch_size * max(layer_sizes) ** 2
+		if work < SMALL_WORK:
+			blas_threads = 1
+		else:
+			# Give CPUs left over by too few tasks to BLAS threads
+			blas_threads = min(n_cpus, MAX_BLAS_THREADS,
+							   max(-(-work // SMALL_WORK),
+								   n_cpus // max(1, n_tasks)))
+		if n_processes is not None:
+			blas_threads = max(1, min(blas_threads, n_cpus // n_processes))
+	if n_processes is None:
+		n_processes = max(1, min(n_tasks, n_cpus // blas_threads))
+	return WorkerPlan(n_processes, blas_threads, cpus if pin else None)
+
+def init_worker(blas_threads, cpus, slots=None):
+	"""Initialise a worker process, limiting BLAS threads and pinning it.
+
+	Used as a multiprocessing pool initializer. BLAS libraries already
+	loaded (with numpy imported before forking) are limited through
+	threadpoolctl when installed, environment variables covering the
+	others. If cpus is given, slots is a shared counter (multiprocessing
+	Value) from which each worker takes its slot, pinning it to the
+	slot-th set of blas_threads CPUs.
+
+	"""
+	global _thread_limits
+	for var in BLAS_ENV_VARS:
+		os.environ[var] = str(blas_threads)
+	if threadpoolctl is not None:
+		_thread_limits = threadpoolctl.threadpool_limits(limits=blas_threads)
+	if cpus is not None:
+		with slots.get_lock():
+			worker_i = slots.value
+			slots.value += 1
+		first = worker_i * blas_threads
+		os.sched_setaffinity(0, [cpus[(first + i) % len(cpus)]
+								 for i in range(blas_threads)])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Check that all compute backends match the numpy reference backend.
+
+Exit with an AssertionError if a backend differs from numpy by more than
+TOLERANCE, either on the network state after training or on the errors
+and hidden representations recorded by Subject.fam_training. Backends
+that are not available here (e.g. numba not installed) are skipped.
+
+"""
+import numpy as np
+
+import Backends as bk
+from Experiments import *
+
+TOLERANCE = 1e-10
+
+def fam_training_diff(backend, n_steps=200, seed=0):
+	"""Maximum difference between fam_training outputs of backend and numpy."""
+	e = Experiment((8,10,10), .1, (.01, .01, .005), 4, n_steps, 200, 1e-2, 6/28)
+	outputs = []
+	for name in ("numpy", backend):
+		# Same seed for identical network weights and stimuli order
+		np.random.seed(seed)
+		s = Subject(e.l_size+e.h_size+e.t_size, e.l_size, e.h_size,
+					e.h_ratio, e.lrn_rates, e.momentum, name)
+		outputs.append(s.fam_training(e.fam_stims[1], n_steps, 50))
+	(ref_errors, ref_h_reps), (errors, h_reps) = outputs
+	assert sorted(ref_errors) == sorted(errors), "Recorded blocks differ"
+	return max(max(np.max(np.abs(np.subtract(ref_errors[b], errors[b])))
+				   for b in ref_errors),
+			   max(np.max(np.abs(ref_h_reps[b][stim] - h_reps[b][stim]))
+				   for b in ref_h_reps for stim in ref_h_reps[b]))
+
+def main():
+	for name in sorted(bk.BACKENDS):
+		net_diff = bk.compare_backends(name)
+		if net_diff is None:
+			print(name, "SKIPPED: backend unavailable for this network")
+			continue
+		assert net_diff < TOLERANCE, \
+			"{} network state differs from numpy by {}".format(name, net_diff)
+		fam_diff = fam_training_diff(name)
+		assert fam_diff < TOLERANCE, \
+			"{} fam_training differs from numpy by {}".format(name, fam_diff)
+		print(name, "OK", net_diff, fam_diff)
+
+if __name__ == "__main__":
+	main()
@@ -1,35 +1,103 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import time
+import argparse
 import warnings
 from multiprocessing import Pool
 
 from Experiments import *
+import Backends as bk
+import JobQueues as jq
 
-def run_subjects(lrn_rates, ratio, verbose=True):
-	if verbose:
-		t = time.time()
-		print("=" * 50)
-		print("Starting run for lrn_rates =", lrn_rates)
-	e = Experiment((8,10,10), .1, lrn_rates, 48, 20000, 200, 1e-2, 6/28)
-	results = e.run_experiment()
+def make_experiment(lrn_rates, **options):
+	return Experiment((8,10,10), .1, lrn_rates, 48, 20000, 200, 1e-2, 6/28,
+					  **options)
+
+def output_results(results, ratio):
 	Experiment.output_fam_data(results[0],
 							   "../results/data/familiarisation_" + ratio)
 	Experiment.output_contrast_data(results[1],
 									"../results/data/contrast_test_trials_" + ratio)
+
+def run_subjects(lrn_rates, ratio, verbose=True, **options):
+	if verbose:
+		t = time.time()
+		print("=" * 50)
+		print("Starting run for lrn_rates =", lrn_rates)
+	e = make_experiment(lrn_rates, **options)
+	output_results(e.run_experiment(), ratio)
 	if verbose:
 		t = time.gmtime(time.time() - t)
 		print("Run finished in", time.strftime("%H:%M:%S",t))
 
+def run_subjects_queued(runs, queue_dir, queue_timeout=None, verbose=True,
+						**options):
+	"""Run experiments through the shared queue at queue_dir.
+
+	runs is a list of (lrn_rates, ratio) tuples. All experiments are
+	published before any is collected, so that workers can run subjects
+	from all of them at once.
+
+	"""
+	t = time.time()
+	published = []
+	for lrn_rates, ratio in runs:
+		e = make_experiment(lrn_rates, **options)
+		published.append((e, e.publish(queue_dir, queue_timeout), ratio))
+		if verbose:
+			print("Published run for lrn_rates =", lrn_rates)
+	for e, exp_id, ratio in published:
+		output_results(e.collect(queue_dir, exp_id, queue_timeout), ratio)
+		if verbose:
+			elapsed = time.gmtime(time.time() - t)
+			print("Collected run for lrn_rates =", e.lrn_rates,
+				  "at", time.strftime("%H:%M:%S", elapsed))
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Run salience-diagnosticity experiments.")
+	parser.add_argument("--backend", default="numpy", choices=sorted(bk.BACKENDS),
+						help="compute backend for networks")
+	parser.add_argument("--processes", type=int, default=None,
+						help="number of worker processes (default: planned)")
+	parser.add_argument("--blas-threads", type=int, default=None,
+						help="BLAS threads per worker process (default: planned)")
+	parser.add_argument("--pin-workers", action="store_true",
+						help="pin each worker process to its own CPUs")
+	parser.add_argument("--queue", default=None,
+						help="shared queue directory to publish subjects to, "
+						"instead of running them locally (see JobQueues.py)")
+	parser.add_argument("--queue-timeout", type=float, default=None,
+						help="seconds after which jobs of unresponsive queue "
+						"workers are run again, longer than {}s (default: "
+						"never)".format(jq.HEARTBEAT))
+	args = parser.parse_args()
+	try:
+		jq.check_timeout(args.queue_timeout)
+	except ValueError as error:
+		parser.error(str(error))
+	return args
+
 def main():
+	args = parse_args()
+	options = {"backend": args.backend,
+			   "n_processes": args.processes,
+			   "blas_threads": args.blas_threads,
+			   "pin_workers": args.pin_workers}
+	if args.backend == "numba" and bk.numba is None:
+		# Report fallback here, as warnings are ignored from now on
+		print("numba is not installed, using numpy backend instead")
 	total = time.time()
 	warnings.filterwarnings("ignore")
 	# Run experiment
-	results = {}
+	runs = []
 	for low_salience_ratio in range(1, 10):
 		low_salience_rate = .01*low_salience_ratio/10
-		results[low_salience_rate] = run_subjects((.01, .01, low_salience_rate),
-												  str(low_salience_ratio))
+		runs.append(((.01, .01, low_salience_rate), str(low_salience_ratio)))
+	if args.queue is not None:
+		run_subjects_queued(runs, args.queue, args.queue_timeout, **options)
+	else:
+		for lrn_rates, ratio in runs:
+			run_subjects(lrn_rates, ratio, **options)
 	total = time.gmtime(time.time() - total)
 	print("="*27,
 		  "Total run time:",